@@ -1,16 +1,26 @@
 # india_csp.py
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Set
 import geopandas as gpd
 import matplotlib.pyplot as plt
-import copy
+import shapely
+import os
+import pickle
+from array import array
 import time
 
 # ----------------------------
 # Config
 # ----------------------------
 GEOJSON_PATH = "india_states_geoboundaries.geojson"   # path to India states GeoJSON
+# cleaned GeoDataFrame + adjacency from the last build, reused while the GeoJSON is unchanged
+ADJACENCY_CACHE_PATH = "india_adjacency_cache.pkl"
 # extended palette (8 colors)
 COLOR_PALETTE: List[str] = ["#e31a93", "#ffff00", "#1f78b4", "#33a02c", "#e31a1c", "#ff7f00"]
+# color -> bit index used by the bitmask domains
+COLOR_IDX: Dict[str, int] = {color: index for index, color in enumerate(COLOR_PALETTE)}
+
+# number of colors left in a domain bitmask (int.bit_count needs Python 3.10+)
+popcount = int.bit_count if hasattr(int, "bit_count") else (lambda mask: bin(mask).count("1"))
 
 # ----------------------------
 # Types
@@ -18,7 +28,8 @@ COLOR_PALETTE: List[str] = ["#e31a93", "#ffff00", "#1f78b4", "#33a02c", "#e31a1c
 Variable = str     # state name
 Color = str
 Adjacency = Dict[Variable, List[Variable]]
-Domains = Dict[Variable, List[Color]]
+Domains = Dict[Variable, int]   # bit COLOR_IDX[color] set iff color is still allowed
+Pruned = List[Tuple[Variable, int]]   # (neighbor, removed bit) pairs for undo
 
 # ----------------------------
 # Load geojson and build adjacency
@@ -38,11 +49,24 @@ def detect_state_name_column(geo_dataframe: gpd.GeoDataFrame) -> str:
             return column
     raise ValueError("Couldn't detect a state-name column in the GeoDataFrame. Columns: " + ", ".join(geo_dataframe.columns))
 
-def build_adjacency(geojson_path: str) -> Tuple[gpd.GeoDataFrame, Adjacency, str]:
+def build_adjacency(geojson_path: str, cache_path: Optional[str] = ADJACENCY_CACHE_PATH) -> Tuple[gpd.GeoDataFrame, Adjacency, str]:
     """
     Load geojson, fix geometries, create a deterministic adjacency list (touching or intersecting geometries).
+    Results are pickled to cache_path, keyed by the GeoJSON's path, mtime and size,
+    and reused on later runs while that key matches (pass cache_path=None to disable).
     Returns (gdf, adjacency, state_name_column_used).
     """
+    cache_key = (os.path.abspath(geojson_path), os.path.getmtime(geojson_path), os.path.getsize(geojson_path))
+    if cache_path is not None and os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as cache_file:
+                cached_key, cached_gdf, cached_adjacency = pickle.load(cache_file)
+            if cached_key == cache_key:
+                return cached_gdf, cached_adjacency, "state_name_for_csp"
+        except Exception:
+            # unreadable / stale-format cache: rebuild below
+            pass
+
     gdf = gpd.read_file(geojson_path)
 
     # make sure we work in a consistent CRS (WGS84 lat/lon)
@@ -60,59 +84,35 @@ def build_adjacency(geojson_path: str) -> Tuple[gpd.GeoDataFrame, Adjacency, str
     # canonical state name column for keys
     gdf["state_name_for_csp"] = gdf[state_name_column].astype(str).str.strip()
 
-    # spatial index for speed
-    spatial_index = gdf.sindex
-
-    adjacency: Adjacency = {}
-    for row_index, row in gdf.iterrows():
-        state_name = row["state_name_for_csp"]
-        adjacency[state_name] = []
-
-    # Build adjacency using bounding-box candidates and robust intersection tests
-    for row_index, row in gdf.iterrows():
-        state_name = row["state_name_for_csp"]
-        geometry = row.geometry
-        if geometry is None:
-            continue
-        candidate_indices = list(spatial_index.intersection(geometry.bounds))
-        for candidate_index in candidate_indices:
-            if candidate_index == row_index:
-                continue
-            candidate_state = gdf.at[candidate_index, "state_name_for_csp"]
-            candidate_geometry = gdf.at[candidate_index, "geometry"]
-            if candidate_geometry is None:
-                continue
-            are_neighbors = False
-            try:
-                # Prefer touches for clean boundary adjacency
-                if geometry.touches(candidate_geometry):
-                    are_neighbors = True
-                else:
-                    # fallback: check intersection non-empty (catches shared boundary lines and areas)
-                    inter = geometry.intersection(candidate_geometry)
-                    if inter is not None and not inter.is_empty:
-                        are_neighbors = True
-            except Exception:
-                # Some geometries may cause topology errors; fallback to intersects
-                try:
-                    if geometry.intersects(candidate_geometry):
-                        are_neighbors = True
-                except Exception:
-                    are_neighbors = False
-
-            if are_neighbors:
-                adjacency[state_name].append(candidate_state)
-
-    # make adjacency lists deterministic and symmetric
-    for state in list(adjacency.keys()):
-        adjacency[state] = sorted(set(adjacency[state]))
-    for state, neighbors in list(adjacency.items()):
-        for neighbor in neighbors:
-            if neighbor not in adjacency:
-                continue
-            if state not in adjacency[neighbor]:
-                adjacency[neighbor].append(state)
-                adjacency[neighbor] = sorted(set(adjacency[neighbor]))
+    # plain positional arrays: avoids pandas label lookups / iterrows() row boxing below
+    geoms = gdf.geometry.to_numpy()
+    names = gdf["state_name_for_csp"].to_numpy()
+
+    # neighbor sets while building; sorted lists only once at the end
+    neighbor_sets: Dict[Variable, Set[Variable]] = {state_name: set() for state_name in names}
+
+    # Build adjacency with one vectorized STRtree query: pairs whose geometries
+    # touch or share any boundary/area (i.e. intersect). Missing geometries are
+    # never returned by the tree. Adding both directions keeps it symmetric.
+    tree = shapely.STRtree(geoms)
+    left_indices, right_indices = tree.query(geoms, predicate="intersects")
+    # drop self-pairs with one boolean mask and gather both name columns in bulk
+    not_self = left_indices != right_indices
+    left_names = names[left_indices[not_self]].tolist()
+    right_names = names[right_indices[not_self]].tolist()
+    for left_name, right_name in zip(left_names, right_names):
+        neighbor_sets[left_name].add(right_name)
+        neighbor_sets[right_name].add(left_name)
+
+    # deterministic adjacency lists
+    adjacency: Adjacency = {state: sorted(neighbors) for state, neighbors in neighbor_sets.items()}
+
+    if cache_path is not None:
+        try:
+            with open(cache_path, "wb") as cache_file:
+                pickle.dump((cache_key, gdf, adjacency), cache_file)
+        except OSError as cache_exc:
+            print("Could not write adjacency cache:", cache_exc)
 
     return gdf, adjacency, "state_name_for_csp"
 
@@ -120,86 +120,179 @@ def build_adjacency(geojson_path: str) -> Tuple[gpd.GeoDataFrame, Adjacency, str
 # CSP components: variables/domains/constraint
 # ----------------------------
 def get_variables(adjacency: Adjacency) -> List[Variable]:
-    """Return list of state names (variables) sorted deterministically."""
-    return sorted(list(adjacency.keys()))
+    """
+    Return list of state names (variables) in static most-constrained-first order:
+    decreasing degree (number of neighbors), then name for determinism.
+    Selection falls back to this order whenever MRV ties.
+    """
+    return sorted(adjacency, key=lambda variable: (-len(adjacency[variable]), variable))
 
 def get_domain(variable: Variable) -> List[Color]:
     """Return full palette as domain for each state (no precoloring)."""
     return list(COLOR_PALETTE)
 
-def check_constraint(assignments: Dict[Variable, Color], adjacency: Adjacency, variable: Variable, color_choice: Color) -> bool:
+def check_constraint(domains: Domains, variable: Variable, color_choice: Color) -> bool:
     """
     Constraint: neighboring states must not have the same color.
-    Check consistency of assigning `variable=color_choice` with current `assignments`.
+    Forward checking clears a color's bit from every unassigned neighbor of an
+    assigned state, so the check is a single bit test on the variable's domain.
+    Used for caller-supplied assignments; search only tries colors still in the domain.
     """
-    for neighbor in adjacency.get(variable, []):
-        if neighbor in assignments and assignments[neighbor] == color_choice:
-            return False
-    return True
+    return (domains[variable] >> COLOR_IDX[color_choice]) & 1 == 1
+
+def domain_colors(domain: int) -> List[Color]:
+    """Return the palette colors whose bits are set in a domain bitmask."""
+    return [color for index, color in enumerate(COLOR_PALETTE) if (domain >> index) & 1]
 
 # ----------------------------
-# Selection (simple first-unassigned)
+# Forward checking helpers
 # ----------------------------
-def select_unassigned_variable(variables: List[Variable], assignments: Dict[Variable, Color]) -> Optional[Variable]:
-    """Return first variable (state) not yet assigned."""
-    for variable in variables:
-        if variable not in assignments:
-            return variable
-    return None
+def initial_domains(variables: List[Variable]) -> Domains:
+    """Build the starting domain (full palette) for every state as a bitmask."""
+    full_palette_mask = (1 << len(COLOR_PALETTE)) - 1
+    return {variable: full_palette_mask for variable in variables}
+
+def forward_check(variable: Variable, color_choice: Color, domains: Domains, assignments: Dict[Variable, Color], adjacency: Adjacency) -> Optional[Pruned]:
+    """
+    Clear color_choice's bit from the domains of unassigned neighbors of variable.
+    Return the list of (neighbor, bit) removals so the caller can undo them,
+    or None (with removals already undone) if some neighbor has no color left.
+    """
+    pruned_list: Pruned = []
+    bit = 1 << COLOR_IDX[color_choice]
+    for neighbor in adjacency.get(variable, []):
+        if neighbor in assignments:
+            continue
+        if domains[neighbor] & bit:
+            domains[neighbor] ^= bit
+            pruned_list.append((neighbor, bit))
+            if not domains[neighbor]:
+                undo_pruning(pruned_list, domains)
+                return None
+    return pruned_list
+
+def undo_pruning(pruned_list: Pruned, domains: Domains):
+    """Undo the domain removals recorded in pruned_list."""
+    for neighbor, removed_bit in pruned_list:
+        domains[neighbor] |= removed_bit
 
 # ----------------------------
-# Backtracking solver (simple)
+# Selection (MRV + degree) and value ordering (LCV)
 # ----------------------------
-assignments_count = 0
-backtracks_count = 0
+def select_unassigned_variable(variables: List[Variable], assignments: Dict[Variable, Color], domains: Domains, adjacency: Adjacency) -> Optional[Variable]:
+    """
+    MRV: pick the unassigned state with the fewest remaining colors,
+    breaking ties by highest degree (most neighbors), then by order in `variables`
+    (see get_variables for the static ordering).
+    """
+    unassigned = [variable for variable in variables if variable not in assignments]
+    if not unassigned:
+        return None
+    return min(unassigned, key=lambda variable: (popcount(domains[variable]), -len(adjacency[variable])))
 
-def backtrack_solve(variables: List[Variable], adjacency: Adjacency, assignments: Dict[Variable, Color], verbose: bool = True) -> Optional[Dict[Variable, Color]]:
+def order_domain_values(variable: Variable, domains: Domains, assignments: Dict[Variable, Color], adjacency: Adjacency) -> List[Color]:
     """
-    Simple backtracking solver:
-      - selects first unassigned variable
-      - iterates its domain (full palette)
-      - checks constraint against already assigned neighbors
-      - assigns and recurses
+    LCV: try first the colors that rule out the fewest options for unassigned neighbors.
+    Ties are broken by color string for determinism.
     """
-    global assignments_count, backtracks_count
+    unassigned_neighbors = [neighbor for neighbor in adjacency.get(variable, []) if neighbor not in assignments]
+    return sorted(
+        domain_colors(domains[variable]),
+        key=lambda color: (sum((domains[neighbor] >> COLOR_IDX[color]) & 1 for neighbor in unassigned_neighbors), color),
+    )
+
+# ----------------------------
+# Backtracking solver (MRV + LCV + forward checking)
+# ----------------------------
+def backtrack_solve(variables: List[Variable], adjacency: Adjacency, assignments: Dict[Variable, Color], domains: Domains, counters: array, verbose: bool = False) -> Optional[Dict[Variable, Color]]:
+    """
+    Backtracking solver:
+      - selects the unassigned variable by MRV (degree tie-break)
+      - iterates its remaining domain in LCV order
+      - assigns, forward-checks neighbors' domains and descends
+    Pre-assigned `assignments` are checked and forward-checked into `domains` first;
+    otherwise `domains` must reflect the current domains for each variable.
+    Returns a new {state: color} dict or None; assignments / backtracks are added to counters.
+    Pass verbose=True to trace every selection/assignment (slow: formats and prints per step).
+    """
+    assignments_made = 0
+    backtracks_made = 0
+
+    def push_frame(stack: List[list]) -> bool:
+        """Select the next variable and push its frame; return False if none is left."""
+        variable = select_unassigned_variable(variables, assignments, domains, adjacency)
+        if variable is None:
+            return False
+        domain_values = order_domain_values(variable, domains, assignments, adjacency)
+        if verbose:
+            print(f"Selecting variable: {variable}, domain = {domain_values}")
+        stack.append([variable, iter(domain_values), None, None])
+        return True
+
+    # forward-check the pre-assigned variables in turn; a seed whose color an
+    # earlier seed already pruned conflicts with that neighbor
+    seeded: Dict[Variable, Color] = {}
+    seed_pruned: Pruned = []
+    for variable, color_choice in assignments.items():
+        pruned = None
+        if check_constraint(domains, variable, color_choice):
+            seeded[variable] = color_choice
+            pruned = forward_check(variable, color_choice, domains, seeded, adjacency)
+        if pruned is None:
+            if verbose:
+                print(f"  => pre-assigned color {color_choice} not allowed for {variable} (neighbor conflict)")
+            undo_pruning(seed_pruned, domains)
+            return None
+        seed_pruned.extend(pruned)
 
     # completion check
     if len(assignments) == len(variables):
         return dict(assignments)
 
-    variable = select_unassigned_variable(variables, assignments)
-    if variable is None:
-        return None
-
-    domain_values = get_domain(variable)
-    # deterministic ordering (sorted by color string)
-    domain_values = sorted(domain_values)
+    # frames: [variable, remaining colors, color tried (None = none), its prunings]
+    stack: List[list] = []
+    push_frame(stack)
 
-    if verbose:
-        print(f"Selecting variable: {variable}, domain = {domain_values}")
+    while stack:
+        frame = stack[-1]
+        variable, domain_values, color_choice, pruned = frame
 
-    for color_choice in domain_values:
-        if not check_constraint(assignments, adjacency, variable, color_choice):
+        if color_choice is not None:
+            # undo
+            if pruned is not None:
+                undo_pruning(pruned, domains)
             if verbose:
-                print(f"  => color {color_choice} not allowed for {variable} (neighbor conflict)")
+                print(f"  UNASSIGN {variable} (backtracking)")
+            del assignments[variable]
+            backtracks_made += 1
+
+        color_choice = next(domain_values, None)
+        if color_choice is None:
+            stack.pop()  # colors exhausted -> backtrack to the parent frame
             continue
 
         # assign
         assignments[variable] = color_choice
-        assignments_count += 1
+        assignments_made += 1
         if verbose:
             print(f"  ASSIGN {variable} = {color_choice}")
 
-        result = backtrack_solve(variables, adjacency, assignments, verbose=verbose)
-        if result is not None:
-            return result
+        # forward check: prune neighbors' domains
+        pruned = forward_check(variable, color_choice, domains, assignments, adjacency)
+        frame[2] = color_choice
+        frame[3] = pruned
+        if pruned is None:
+            continue
 
-        # undo
-        if verbose:
-            print(f"  UNASSIGN {variable} (backtracking)")
-        del assignments[variable]
-        backtracks_count += 1
+        if len(assignments) == len(variables):
+            counters[0] += assignments_made
+            counters[1] += backtracks_made
+            return dict(assignments)
+        push_frame(stack)
 
+    undo_pruning(seed_pruned, domains)
+    counters[0] += assignments_made
+    counters[1] += backtracks_made
     return None
 
 # ----------------------------
@@ -235,11 +328,11 @@ if __name__ == "__main__":
     for state in variables[:12]:
         print(f"  {state}: {get_domain(state)}")
 
-    # run simple solver
-    assignments_count = 0
-    backtracks_count = 0
+    # run solver
+    domains = initial_domains(variables)
+    counters = array("Q", [0, 0])
     start_time = time.perf_counter()
-    solution = backtrack_solve(variables, adjacency, {}, verbose=True)
+    solution = backtrack_solve(variables, adjacency, {}, domains, counters, verbose=False)
     elapsed_time = time.perf_counter() - start_time
 
     if solution is None:
@@ -255,4 +348,4 @@ if __name__ == "__main__":
         except Exception as plot_exc:
             print("Plotting failed:", plot_exc)
 
-    print(f"\nAssignments: {assignments_count}, Backtracks: {backtracks_count}, Time: {elapsed_time:.4f}s")
+    print(f"\nAssignments: {counters[0]}, Backtracks: {counters[1]}, Time: {elapsed_time:.4f}s")
@@ -1,6 +1,8 @@
 # sudoku_csp.py
-from typing import List, Tuple, Optional, Dict
-import copy
+from typing import List, Tuple, Optional
+from array import array
+from collections import deque
+from dataclasses import dataclass
 import time
 
 # ----------------------------
@@ -8,214 +10,380 @@ import time
 # ----------------------------
 Variable = Tuple[int, int]
 Grid = List[List[int]]
+FlatGrid = bytearray   # 81 cells, index row * 9 + column, 0 = empty
+Cell = int   # flat cell index: row * 9 + column
+Domains = array   # 81 uint16 bitmasks indexed by Cell; bit v set iff value v is still possible
+Trail = array   # int entries cell << 10 | removed bits, popped back to a saved length on undo
 
 # ----------------------------
-# CSP Components: Variables, Domain, Constraints
+# Bitmask state (row/column/box used digits)
+# ----------------------------
+# bits 1..9 set: every digit still possible
+ALL_VALUES_MASK = 0x3FE
+
+# popcount of a domain bitmask: int.bit_count (one C call) on Python 3.10+,
+# else a lookup table covering every 10-bit mask
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    _POPCOUNT_TABLE = bytes(bin(mask).count("1") for mask in range(1024))
+    popcount = _POPCOUNT_TABLE.__getitem__
+
+@dataclass
+class State:
+    """
+    Search state: `grid` is the flat 81-byte board the search fills in (emptiness
+    tests and output). bit v of row_used[r] / col_used[c] / box_used[b] is set iff
+    digit v is among the givens of that row / column / box; the masks are setup
+    data for initial_domains and are not updated during search (the domains carry
+    that information from then on).
+    """
+    grid: FlatGrid
+    row_used: array
+    col_used: array
+    box_used: array
+
+# per-cell lookup tables (flat cell -> row / column / 3x3 box number), built once at import
+ROW_OF: Tuple[int, ...] = tuple(cell // 9 for cell in range(81))
+COL_OF: Tuple[int, ...] = tuple(cell % 9 for cell in range(81))
+BOX_OF: Tuple[int, ...] = tuple((cell // 27) * 3 + (cell % 9) // 3 for cell in range(81))
+# the 9 flat cells of each box, in row-major order
+BOX_CELLS: Tuple[Tuple[Cell, ...], ...] = tuple(
+    tuple(cell for cell in range(81) if BOX_OF[cell] == box) for box in range(9)
+)
+
+def flatten(grid: Grid) -> FlatGrid:
+    """Pack a 9x9 grid into 81 bytes (row-major)."""
+    return bytearray(value for row in grid for value in row)
+
+def unflatten(flat: FlatGrid) -> Grid:
+    """Expand 81 row-major bytes back into a 9x9 grid."""
+    return [list(flat[row * 9:row * 9 + 9]) for row in range(9)]
+
+def make_state(grid: Grid) -> State:
+    """
+    Build the search state from a 9x9 grid (which is not modified): a flat copy of
+    the board plus the row/column/box bitmasks, in a single pass over the givens.
+    """
+    state = State(flatten(grid), array("H", [0] * 9), array("H", [0] * 9), array("H", [0] * 9))
+    for cell, value in enumerate(state.grid):
+        if value != 0:
+            bit = 1 << value
+            state.row_used[ROW_OF[cell]] |= bit
+            state.col_used[COL_OF[cell]] |= bit
+            state.box_used[BOX_OF[cell]] |= bit
+    return state
+
+def used_mask(state: State, cell: Cell) -> int:
+    """Bitmask of digits already used by the row, column and box of cell."""
+    return state.row_used[ROW_OF[cell]] | state.col_used[COL_OF[cell]] | state.box_used[BOX_OF[cell]]
+
+# ----------------------------
+# CSP Components: Variables, Domain (constraints are enforced through the domains below)
 # ----------------------------
 
 def get_variables() -> List[Variable]:
     """Return list of variables (row, column) for 9x9 Sudoku."""
     return [(row, column) for row in range(9) for column in range(9)]
 
-def get_domain(grid: Grid, var: Variable) -> List[int]:
+# shared, never mutated: callers only iterate the domain
+_FULL_DOMAIN: Tuple[int, ...] = tuple(range(1, 10))
+
+def get_domain(grid: Grid, var: Variable) -> Tuple[int, ...]:
     """Return domain for a given variable (cell). If already filled -> fixed domain. Else -> 1-9."""
     row, column = var
     if grid[row][column] != 0:
-        return [grid[row][column]]
-    return list(range(1, 10))
-
-def check_constraint(grid: Grid, var: Variable, value: int) -> bool:
-    """Check CSP constraints (row, column, box). Skip the cell itself when scanning."""
-    row, column = var
-
-    # Row constraint (skip the cell itself)
-    for peer_column in range(9):
-        if peer_column == column:
-            continue
-        if grid[row][peer_column] == value:
-            return False
-
-    # Column constraint (skip the cell itself)
-    for peer_row in range(9):
-        if peer_row == row:
-            continue
-        if grid[peer_row][column] == value:
-            return False
-
-    # Box constraint (3x3) (skip the cell itself)
-    box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
-    for box_row_index in range(box_start_row, box_start_row + 3):
-        for box_column_index in range(box_start_column, box_start_column + 3):
-            if box_row_index == row and box_column_index == column:
-                continue
-            if grid[box_row_index][box_column_index] == value:
-                return False
-
-    return True
+        return (grid[row][column],)
+    return _FULL_DOMAIN
 
 # ----------------------------
 # Forward checking helpers
 # ----------------------------
+def _build_peers() -> Tuple[bytes, ...]:
+    """
+    Build the peer table once: for each flat cell, the cells sharing its row, column, or 3x3 box
+    (excluding itself), packed as 20 bytes; iterating a bytes object yields the cells as ints.
+    """
+    peers: List[bytes] = []
+    for cell in range(81):
+        peers.append(bytes(
+            other for other in range(81)
+            if other != cell
+            and (ROW_OF[other] == ROW_OF[cell] or COL_OF[other] == COL_OF[cell] or BOX_OF[other] == BOX_OF[cell])
+        ))
+    return tuple(peers)
+
+# precomputed at import: peers never change, so forward checking only does a tuple lookup
+PEERS: Tuple[bytes, ...] = _build_peers()
+
+# the 27 units (9 rows, 9 columns, 9 boxes) as tuples of flat cells
+UNITS: Tuple[Tuple[Cell, ...], ...] = (
+    tuple(tuple(cell for cell in range(81) if ROW_OF[cell] == row) for row in range(9))
+    + tuple(tuple(cell for cell in range(81) if COL_OF[cell] == column) for column in range(9))
+    + BOX_CELLS
+)
+
 def peers_of(var: Variable) -> List[Variable]:
-    """Return list of peer coordinates that share row, column, or 3x3 box with var (excluding var)."""
+    """Return peer coordinates that share row, column, or 3x3 box with var (excluding var)."""
     row, column = var
-    peers: List[Variable] = []
-
-    # row peers
-    for peer_column in range(9):
-        if peer_column != column:
-            peers.append((row, peer_column))
+    return [(ROW_OF[peer], COL_OF[peer]) for peer in PEERS[row * 9 + column]]
 
-    # column peers
-    for peer_row in range(9):
-        if peer_row != row:
-            peers.append((peer_row, column))
+def domain_values(domain: int) -> List[int]:
+    """Return the values (ascending) whose bits are set in a domain bitmask."""
+    return [value for value in range(1, 10) if (domain >> value) & 1]
 
-    # box peers
-    box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
-    for box_row_index in range(box_start_row, box_start_row + 3):
-        for box_column_index in range(box_start_column, box_start_column + 3):
-            peer_variable = (box_row_index, box_column_index)
-            if peer_variable != var and peer_variable not in peers:
-                peers.append(peer_variable)
-
-    return peers
-
-def initial_domains(grid: Grid) -> Dict[Variable, List[int]]:
+def initial_domains(state: State) -> Domains:
     """
-    Build initial domains for each variable:
-      - assigned cells -> [value]
-      - unassigned cells -> [1..9] minus values already present in peers
+    Build initial bitmask domains for each cell from the row/column/box bitmasks:
+      - assigned cells -> {value}
+      - unassigned cells -> {1..9} minus values already present in peers
     """
-    domains: Dict[Variable, List[int]] = {}
-    for row in range(9):
-        for column in range(9):
-            variable = (row, column)
-            if grid[row][column] != 0:
-                domains[variable] = [grid[row][column]]
-            else:
-                possible_values = list(range(1, 10))
-                used_in_row = {grid[row][peer_column] for peer_column in range(9) if grid[row][peer_column] != 0}
-                used_in_column = {grid[peer_row][column] for peer_row in range(9) if grid[peer_row][column] != 0}
-                box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
-                used_in_box = {
-                    grid[box_row_index][box_column_index]
-                    for box_row_index in range(box_start_row, box_start_row + 3)
-                    for box_column_index in range(box_start_column, box_start_column + 3)
-                    if grid[box_row_index][box_column_index] != 0
-                }
-                used_values = used_in_row.union(used_in_column).union(used_in_box)
-                domains[variable] = sorted([v for v in possible_values if v not in used_values])
+    domains: Domains = array("H", [0] * 81)
+    for cell, value in enumerate(state.grid):
+        if value != 0:
+            domains[cell] = 1 << value
+        else:
+            domains[cell] = ALL_VALUES_MASK & ~used_mask(state, cell)
     return domains
 
-def forward_check(assign_variable: Variable, assigned_value: int, domains: Dict[Variable, List[int]], grid: Grid) -> Optional[List[Tuple[Variable, int]]]:
+# ----------------------------
+# Arc consistency (AC-3)
+# ----------------------------
+def _is_singleton(domain: int) -> bool:
+    """True iff exactly one value bit is set."""
+    return domain != 0 and domain & (domain - 1) == 0
+
+def revise(domains: Domains, xi: Cell, xj: Cell, trail: Trail) -> bool:
+    """
+    Make arc (xi, xj) consistent for the all-different constraint:
+    a value of xi loses its support only when xj is fixed to that same value,
+    so remove xj's value from xi iff xj's domain is a singleton.
     """
-    Perform forward checking after assigning assign_variable = assigned_value.
-    Remove assigned_value from domains of unassigned peers.
-    Return a list of (peer_variable, removed_value) so caller can undo them on backtrack.
-    If any peer domain becomes empty, return None to indicate failure.
+    domain_j = domains[xj]
+    if domain_j & (domain_j - 1) == 0 and domains[xi] & domain_j:
+        domains[xi] ^= domain_j
+        trail.append(xi << 10 | domain_j)
+        return True
+    return False
+
+def ac3(domains: Domains, trail: Trail, queue: Optional[deque] = None) -> bool:
     """
-    pruned_list: List[Tuple[Variable, int]] = []
+    Enforce arc consistency to a fixpoint. Unless a queue of arcs is given, starts
+    from every arc (xi, xj) with a singleton xj (the only arcs that can prune).
+    Removals are appended to trail for undo.
+    Return False if some domain is wiped out.
+    """
+    if queue is None:
+        queue = deque((xi, xj) for xj in range(81) if _is_singleton(domains[xj]) for xi in PEERS[xj])
+    while queue:
+        xi, xj = queue.popleft()
+        if revise(domains, xi, xj, trail):
+            domain_i = domains[xi]
+            if domain_i == 0:
+                return False
+            # arcs (xk, xi) can only prune once xi is a singleton, so only then are they queued
+            if domain_i & (domain_i - 1) == 0:
+                queue.extend((xk, xi) for xk in PEERS[xi] if xk != xj)
+    return True
 
-    for peer_variable in peers_of(assign_variable):
-        peer_row, peer_column = peer_variable
-        if grid[peer_row][peer_column] != 0:
-            continue
-        if assigned_value in domains.get(peer_variable, []):
-            domains[peer_variable].remove(assigned_value)
-            pruned_list.append((peer_variable, assigned_value))
-            if not domains[peer_variable]:
+# ----------------------------
+# Singles propagation (naked singles via AC-3 + hidden singles)
+# ----------------------------
+def propagate(domains: Domains, trail: Trail, queue: Optional[deque] = None) -> bool:
+    """
+    Propagate to a fixpoint:
+      - naked singles: AC-3 removes a singleton's value from all its peers
+      - hidden singles: a value that fits only one cell of a unit is fixed there
+    Per unit, `seen_once` collects values present in some cell and `seen_twice`
+    those present in at least two, so hidden singles are seen_once & ~seen_twice.
+    Fixed cells keep a singleton domain (MRV picks them next without branching).
+    Removals are appended to trail for undo.
+    Return False if a domain is wiped out or a unit has no place left for a value.
+    """
+    while True:
+        if not ac3(domains, trail, queue):
+            return False
+        queue = deque()
+        for unit in UNITS:
+            seen_once = 0
+            seen_twice = 0
+            for cell in unit:
+                domain = domains[cell]
+                seen_twice |= seen_once & domain
+                seen_once |= domain
+            if seen_once != ALL_VALUES_MASK:
+                return False
+            hidden_singles = seen_once & ~seen_twice
+            while hidden_singles:
+                bit = hidden_singles & -hidden_singles
+                hidden_singles ^= bit
+                for cell in unit:
+                    domain = domains[cell]
+                    if domain & bit:
+                        if domain != bit:
+                            domains[cell] = bit
+                            trail.append(cell << 10 | domain ^ bit)
+                            for peer in PEERS[cell]:
+                                queue.append((peer, cell))
+                        break
+                else:
+                    # its only cell was just fixed to another hidden single
+                    return False
+        if not queue:
+            return True
+
+def forward_check(assign_cell: Cell, assigned_value: int, domains: Domains, trail: Trail) -> bool:
+    """
+    Perform forward checking after assigning assign_cell = assigned_value,
+    then propagate the resulting prunings (AC-3 + hidden singles, see propagate).
+    Remove assigned_value from domains of peers (assigned peers hold a different
+    singleton, so only unassigned peers can lose the bit).
+    Removals are appended to trail so the caller can undo them on backtrack.
+    If any domain becomes empty, undo what was pruned here and return False.
+    """
+    mark = len(trail)
+    bit = 1 << assigned_value
+    queue: deque = deque()
+
+    for peer in PEERS[assign_cell]:
+        if domains[peer] & bit:
+            domains[peer] ^= bit
+            trail.append(peer << 10 | bit)
+            if not domains[peer]:
                 # domain wiped out -> failure
-                return None
+                undo_pruning(trail, mark, domains)
+                return False
+            if _is_singleton(domains[peer]):
+                queue.extend((xk, peer) for xk in PEERS[peer] if xk != assign_cell)
 
-    return pruned_list
+    if not propagate(domains, trail, queue):
+        undo_pruning(trail, mark, domains)
+        return False
 
-def undo_pruning(pruned_list: List[Tuple[Variable, int]], domains: Dict[Variable, List[int]]):
-    """Undo the domain removals recorded in pruned_list."""
-    # restore in reverse order for clarity
-    for variable, removed_value in reversed(pruned_list):
-        if removed_value not in domains[variable]:
-            domains[variable].append(removed_value)
-            domains[variable].sort()
+    return True
+
+def undo_pruning(trail: Trail, mark: int, domains: Domains):
+    """Pop trail back to length mark, ORing each removed mask back into its cell's domain."""
+    while len(trail) > mark:
+        entry = trail.pop()
+        domains[entry >> 10] |= entry & 0x3FF
 
 # ----------------------------
-# MRV selection (uses domains)
+# MRV selection (uses bitmask domains)
 # ----------------------------
-def select_unassigned_variable(grid: Grid, domains: Dict[Variable, List[int]]) -> Optional[Variable]:
+def select_unassigned_variable(state: State, domains: Domains) -> Optional[Cell]:
     """
-    Find next unassigned variable using MRV:
+    Find next unassigned cell (flat index) using MRV:
     choose the empty cell with the smallest number of legal values (according to domains).
-    Tie-break deterministically by row then column.
+    The domain size is a popcount of the cell's domain bitmask.
+    Ties keep the first cell in row-major order.
     """
-    best_variable: Optional[Variable] = None
+    grid = state.grid
+    best_cell: Optional[Cell] = None
     best_domain_size = 10  # larger than max domain size 9
 
-    for row in range(9):
-        for column in range(9):
-            if grid[row][column] == 0:
-                variable = (row, column)
-                domain_values = domains.get(variable, [])
-                domain_size = len(domain_values)
-                # immediate failure detection (domain wiped out)
-                if domain_size == 0:
-                    return variable
-                if domain_size < best_domain_size:
-                    best_domain_size = domain_size
-                    best_variable = variable
-                    if best_domain_size == 1:
-                        return best_variable
-                elif domain_size == best_domain_size and best_variable is not None:
-                    # tie-break deterministically by smaller (row, column)
-                    if variable < best_variable:
-                        best_variable = variable
-
-    return best_variable
+    for cell in range(81):
+        if grid[cell] == 0:
+            domain_size = popcount(domains[cell])
+            # immediate failure detection (domain wiped out)
+            if domain_size == 0:
+                return cell
+            if domain_size < best_domain_size:
+                best_domain_size = domain_size
+                best_cell = cell
+                if best_domain_size == 1:
+                    return best_cell
+
+    return best_cell
 
 # ----------------------------
-# CSP Backtracking Solver (MRV + Forward Checking)
+# LCV ordering (optional, uses bitmask domains)
 # ----------------------------
+def least_constraining_order(cell: Cell, domains: Domains) -> List[int]:
+    """
+    LCV: rank the values in cell's domain by how many options they rule out for peers,
+    i.e. how many peer domains contain them. Assigned peers hold a different singleton,
+    so they never count; ties go to the lowest value. The list is most constraining
+    first, so popping from the end yields the values in LCV order.
+    """
+    peers = PEERS[cell]
+    return sorted(
+        domain_values(domains[cell]),
+        key=lambda value: (sum((domains[peer] >> value) & 1 for peer in peers), value),
+        reverse=True,
+    )
 
-assignments_count = 0
-backtracks_count = 0
+# ----------------------------
+# CSP Backtracking Solver (MRV + Forward Checking + AC-3 + singles)
+# ----------------------------
 
-def backtrack_solve(grid: Grid, domains: Dict[Variable, List[int]]) -> Optional[Grid]:
+def backtrack_solve(state: State, domains: Domains, counters: array, use_lcv: bool = False) -> Optional[Grid]:
     """
-    Backtracking solver that uses MRV for selection and forward checking for pruning.
-    `domains` must reflect current domains for each variable.
+    Backtracking solver that uses MRV for selection and forward checking + AC-3 for pruning.
+    `domains` must reflect current domains for each variable; they are restored if no
+    solution is found. With use_lcv, values are tried in LCV order instead of ascending.
+    Adds the assignments / backtracks made to counters[0] / counters[1] and returns the
+    solved grid, or None.
     """
-    global assignments_count, backtracks_count
-
-    variable = select_unassigned_variable(grid, domains)
-    if not variable:
-        return grid  # solved
-
-    row, column = variable
-    # iterate over a copy so modifications to domains don't affect iteration
-    for value in list(domains[variable]):
-        if check_constraint(grid, variable, value):
-            # assign
-            grid[row][column] = value
-            assignments_count += 1
-
-            # save domain state for this variable so we can restore it after backtracking
-            saved_domain_for_variable = domains[variable]
-            domains[variable] = [value]
-
-            # forward check: prune peers' domains
-            pruned = forward_check(variable, value, domains, grid)
-            if pruned is not None:
-                # continue search
-                result = backtrack_solve(grid, domains)
-                if result is not None:
-                    return result
-
-            # undo prunings (if any) and restore domain and assignment
-            if pruned is not None:
-                undo_pruning(pruned, domains)
-            grid[row][column] = 0
-            domains[variable] = saved_domain_for_variable
-            backtracks_count += 1
+    assignments = 0
+    backtracks = 0
+
+    grid = state.grid
+    trail: Trail = array("i")
+    cell = select_unassigned_variable(state, domains)
+    if cell is None:
+        return unflatten(grid)  # solved
+    # frames: [cell, values left to try (saved domain mask, or the LCV-ranked list),
+    #          value tried (0 = none), trail length before that try]
+    stack: List[list] = [[cell, least_constraining_order(cell, domains) if use_lcv else domains[cell], 0, 0]]
+
+    while stack:
+        frame = stack[-1]
+        cell, remaining_values, value, mark = frame
+
+        if value:
+            # undo prunings and the domain narrowing of the previous try, then the assignment
+            undo_pruning(trail, mark, domains)
+            grid[cell] = 0
+            backtracks += 1
+
+        if not remaining_values:
+            stack.pop()  # values exhausted -> backtrack to the parent frame
+            continue
+        if use_lcv:
+            # the undo above restores every peer domain, so the ranking made at push still holds
+            value = remaining_values.pop()
+            bit = 1 << value
+        else:
+            bit = remaining_values & -remaining_values
+            value = bit.bit_length() - 1
+            frame[1] = remaining_values ^ bit
+        # no constraint check needed: forward checking keeps every value used in the
+        # cell's row/column/box out of its domain, so each remaining bit is legal
+
+        # assign
+        frame[2] = value
+        frame[3] = len(trail)
+        grid[cell] = value
+        assignments += 1
+        if domains[cell] != bit:
+            trail.append(cell << 10 | domains[cell] ^ bit)
+            domains[cell] = bit
+
+        # forward check: prune peers' domains
+        if not forward_check(cell, value, domains, trail):
+            continue
+
+        # continue search
+        next_cell = select_unassigned_variable(state, domains)
+        if next_cell is None:
+            counters[0] += assignments
+            counters[1] += backtracks
+            return unflatten(grid)  # solved
+        stack.append([next_cell, least_constraining_order(next_cell, domains) if use_lcv else domains[next_cell], 0, 0])
 
+    counters[0] += assignments
+    counters[1] += backtracks
     return None
 
 # ----------------------------
@@ -257,14 +425,15 @@ if __name__ == "__main__":
     print("=== Given puzzle ===")
     print_grid(puzzle)
 
-    # build initial domains with simple pruning using peers' assigned values
-    domains = initial_domains(copy.deepcopy(puzzle))
+    # build bitmask state (flat copy of the board) and initial domains from the givens
+    state = make_state(puzzle)
+    domains = initial_domains(state)
 
     # reset counters and run
-    assignments_count = 0
-    backtracks_count = 0
+    counters = array("Q", [0, 0])
     start_time = time.perf_counter()
-    solution = backtrack_solve(copy.deepcopy(puzzle), domains)
+    # AC-3 + singles pre-pass, then search
+    solution = backtrack_solve(state, domains, counters) if propagate(domains, array("i")) else None
     elapsed_time = time.perf_counter() - start_time
 
     if solution:
@@ -273,5 +442,5 @@ if __name__ == "__main__":
     else:
         print("No solution found.")
 
-    print(f"Assignments: {assignments_count}, Backtracks: {backtracks_count}, Time: {elapsed_time:.4f}s")
+    print(f"Assignments: {counters[0]}, Backtracks: {counters[1]}, Time: {elapsed_time:.4f}s")
  
\ No newline at end of file
@@ -1,6 +1,6 @@
 # sudoku_csp.py
 from typing import List, Tuple, Optional
-import copy
+from array import array
 import time
 
 # ----------------------------
@@ -11,41 +11,59 @@ def get_variables() -> List[Tuple[int, int]]:
     """Return list of variables (row, column) for 9x9 Sudoku."""
     return [(row, column) for row in range(9) for column in range(9)]
 
-def get_domain(grid: List[List[int]], var: Tuple[int, int]) -> List[int]:
+# shared, never mutated: callers only iterate the domain
+_FULL_DOMAIN: Tuple[int, ...] = tuple(range(1, 10))
+
+def get_domain(grid: List[List[int]], var: Tuple[int, int]) -> Tuple[int, ...]:
     """Return domain for a given variable (cell). If already filled -> fixed domain. Else -> 1-9."""
     row, column = var
     if grid[row][column] != 0:
-        return [grid[row][column]]
-    return list(range(1, 10))
+        return (grid[row][column],)
+    return _FULL_DOMAIN
+
+# 3x3 box number of each cell, indexed BOX_OF[row][column] (built once at import)
+BOX_OF: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple((row // 3) * 3 + column // 3 for column in range(9)) for row in range(9)
+)
+
+# used-digit bitmasks: bit v set iff digit v is already in that row / column / box
+# (module-level, updated incrementally on assign/undo)
+row_has: List[int] = [0] * 9
+col_has: List[int] = [0] * 9
+box_has: List[int] = [0] * 9
+
+def init_constraint_masks(grid: List[List[int]]):
+    """Reset row_has/col_has/box_has from the digits currently in grid."""
+    for index in range(9):
+        row_has[index] = col_has[index] = box_has[index] = 0
+    for row in range(9):
+        for column in range(9):
+            value = grid[row][column]
+            if value != 0:
+                set_value_bits(row, column, value)
+
+def set_value_bits(row: int, column: int, value: int):
+    """Mark value as used in the row, column and box of (row, column)."""
+    bit = 1 << value
+    row_has[row] |= bit
+    col_has[column] |= bit
+    box_has[BOX_OF[row][column]] |= bit
+
+def clear_value_bits(row: int, column: int, value: int):
+    """Undo set_value_bits (XOR the bit back out)."""
+    bit = 1 << value
+    row_has[row] ^= bit
+    col_has[column] ^= bit
+    box_has[BOX_OF[row][column]] ^= bit
 
 def check_constraint(grid: List[List[int]], var: Tuple[int, int], value: int) -> bool:
-    """Check CSP constraints (row, column, box). Skip the cell itself when scanning."""
+    """
+    Check CSP constraints (row, column, box) with one bitmask test.
+    Requires the row/column/box masks to match grid (see init_constraint_masks).
+    """
     row, column = var
-
-    # Row constraint (skip the cell itself)
-    for column_index in range(9):
-        if column_index == column:
-            continue
-        if grid[row][column_index] == value:
-            return False
-
-    # Column constraint (skip the cell itself)
-    for row_index in range(9):
-        if row_index == row:
-            continue
-        if grid[row_index][column] == value:
-            return False
-
-    # Box constraint (3x3) (skip the cell itself)
-    box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
-    for box_row_index in range(box_start_row, box_start_row + 3):
-        for box_column_index in range(box_start_column, box_start_column + 3):
-            if box_row_index == row and box_column_index == column:
-                continue
-            if grid[box_row_index][box_column_index] == value:
-                return False
-
-    return True
+    bit = 1 << value
+    return not ((row_has[row] | col_has[column] | box_has[BOX_OF[row][column]]) & bit)
 
 # ----------------------------
 # CSP Backtracking Solver
@@ -59,33 +77,56 @@ def select_unassigned_variable(grid: List[List[int]]) -> Optional[Tuple[int, int
                 return (row, column)
     return None
 
-# instrumentation counters (module-level)
-assignments_count = 0
-backtracks_count = 0
-
-def backtrack_solve(grid: List[List[int]]) -> Optional[List[List[int]]]:
-    """Backtracking CSP solver for Sudoku (simple, first-empty selection)."""
-    global assignments_count, backtracks_count
-
+def backtrack_solve(grid: List[List[int]], counters: array) -> Optional[List[List[int]]]:
+    """
+    Backtracking CSP solver for Sudoku (simple, first-empty selection).
+    Fills grid in place and returns it, or None if there is no solution;
+    assignments / backtracks are added to counters[0] / counters[1].
+    """
+    assignments = 0
+    backtracks = 0
+
+    # the masks are module-level: rebuild them from this grid so a fresh import or a
+    # previous solve can't leave them stale
+    init_constraint_masks(grid)
     variable = select_unassigned_variable(grid)
     if not variable:
         return grid  # solved
+    stack: List[list] = [[variable, iter(get_domain(grid, variable)), 0]]
 
-    row, column = variable
-    for value in get_domain(grid, variable):
-        if check_constraint(grid, variable, value):
-            # assign
-            grid[row][column] = value
-            assignments_count += 1
-
-            result = backtrack_solve(grid)
-            if result is not None:
-                return result
+    while stack:
+        frame = stack[-1]
+        variable, values, value = frame
+        row, column = variable
 
+        if value:
             # undo
             grid[row][column] = 0
-            backtracks_count += 1
+            clear_value_bits(row, column, value)
+            backtracks += 1
+
+        for value in values:
+            if check_constraint(grid, variable, value):
+                break
+        else:
+            stack.pop()  # values exhausted -> backtrack to the parent frame
+            continue
 
+        # assign
+        grid[row][column] = value
+        set_value_bits(row, column, value)
+        assignments += 1
+        frame[2] = value
+
+        next_variable = select_unassigned_variable(grid)
+        if not next_variable:
+            counters[0] += assignments
+            counters[1] += backtracks
+            return grid  # solved
+        stack.append([next_variable, iter(get_domain(grid, next_variable)), 0])
+
+    counters[0] += assignments
+    counters[1] += backtracks
     return None
 
 # ----------------------------
@@ -128,10 +169,10 @@ if __name__ == "__main__":
     print_grid(puzzle)
 
     # reset counters and run
-    assignments_count = 0
-    backtracks_count = 0
+    counters = array("Q", [0, 0])
+    grid = [row[:] for row in puzzle]  # working copy; puzzle stays as given
     start_time = time.perf_counter()
-    solution = backtrack_solve(copy.deepcopy(puzzle))
+    solution = backtrack_solve(grid, counters)
     elapsed_time = time.perf_counter() - start_time
 
     if solution:
@@ -140,4 +181,4 @@ if __name__ == "__main__":
     else:
         print("No solution found.")
 
-    print(f"Assignments: {assignments_count}, Backtracks: {backtracks_count}, Time: {elapsed_time:.4f}s")
+    print(f"Assignments: {counters[0]}, Backtracks: {counters[1]}, Time: {elapsed_time:.4f}s")
@@ -1,6 +1,7 @@
 # sudoku_csp.py
-from typing import List, Tuple, Optional, Dict
-import copy
+from typing import List, Tuple, Optional
+from array import array
+from collections import deque
 import time
 
 # ----------------------------
@@ -9,191 +10,225 @@ import time
 
 Variable = Tuple[int, int]
 Grid = List[List[int]]
+FlatGrid = bytearray   # 81 cells, index row * 9 + column, 0 = empty
+# 81 bitmasks indexed by row * 9 + column; bit v set iff value v is still possible
+Domains = List[int]
 
 def get_variables() -> List[Variable]:
     """Return list of variables (row, column) for 9x9 Sudoku."""
     return [(row, column) for row in range(9) for column in range(9)]
 
-def get_domain(grid: Grid, var: Variable) -> List[int]:
-    """Return domain for a given variable (cell). If already filled -> fixed domain. Else -> 1-9."""
-    row, column = var
-    if grid[row][column] != 0:
-        return [grid[row][column]]
-    return list(range(1, 10))
+def flatten(grid: Grid) -> FlatGrid:
+    """Pack a 9x9 grid into 81 bytes (row-major)."""
+    return bytearray(value for row in grid for value in row)
 
-def check_constraint(grid: Grid, var: Variable, value: int) -> bool:
-    """Check CSP constraints (row, column, box). Skip the cell itself when scanning."""
-    row, column = var
+def unflatten(flat: FlatGrid) -> Grid:
+    """Expand 81 row-major bytes back into a 9x9 grid."""
+    return [list(flat[row * 9:row * 9 + 9]) for row in range(9)]
 
-    # Row constraint (skip the cell itself)
-    for peer_column in range(9):
-        if peer_column == column:
-            continue
-        if grid[row][peer_column] == value:
-            return False
+# per-cell lookup tables (flat index -> row / column / 3x3 box number), built once at import
+ROW_OF: Tuple[int, ...] = tuple(index // 9 for index in range(81))
+COL_OF: Tuple[int, ...] = tuple(index % 9 for index in range(81))
+BOX_OF: Tuple[int, ...] = tuple((index // 27) * 3 + (index % 9) // 3 for index in range(81))
 
-    # Column constraint (skip the cell itself)
-    for peer_row in range(9):
-        if peer_row == row:
-            continue
-        if grid[peer_row][column] == value:
-            return False
-
-    # Box constraint (3x3) (skip the cell itself)
-    box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
-    for box_row_index in range(box_start_row, box_start_row + 3):
-        for box_column_index in range(box_start_column, box_start_column + 3):
-            if box_row_index == row and box_column_index == column:
-                continue
-            if grid[box_row_index][box_column_index] == value:
-                return False
+# shared, never mutated: callers only iterate the domain
+_FULL_DOMAIN: Tuple[int, ...] = tuple(range(1, 10))
 
-    return True
+def get_domain(grid: Grid, var: Variable) -> Tuple[int, ...]:
+    """Return domain for a given variable (cell). If already filled -> fixed domain. Else -> 1-9."""
+    row, column = var
+    if grid[row][column] != 0:
+        return (grid[row][column],)
+    return _FULL_DOMAIN
 
 # ----------------------------
 # Forward checking helpers (fixed)
 # ----------------------------
-def initial_domains(grid: Grid) -> Dict[Variable, List[int]]:
+def initial_domains(flat: FlatGrid) -> Domains:
     """
-    Build initial domains for each variable:
-    - assigned cells -> [value]
-    - unassigned cells -> [1..9] minus values already present in peers
+    Build initial bitmask domains for each cell:
+    - assigned cells -> {value}
+    - unassigned cells -> {1..9} minus values already present in peers
     """
-    domains: Dict[Variable, List[int]] = {}
-    for row in range(9):
-        for column in range(9):
-            variable = (row, column)
-            if grid[row][column] != 0:
-                domains[variable] = [grid[row][column]]
-            else:
-                # start with all values then prune those seen in peers
-                possible_values = list(range(1, 10))
-                # remove values that are already present in the row
-                used_in_row = {grid[row][peer_column] for peer_column in range(9) if grid[row][peer_column] != 0}
-                # remove values that are already present in the column
-                used_in_column = {grid[peer_row][column] for peer_row in range(9) if grid[peer_row][column] != 0}
-                # remove values that are already present in the 3x3 box
-                box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
-                used_in_box = {
-                    grid[box_row_index][box_column_index]
-                    for box_row_index in range(box_start_row, box_start_row + 3)
-                    for box_column_index in range(box_start_column, box_start_column + 3)
-                    if grid[box_row_index][box_column_index] != 0
-                }
-                used_values = used_in_row.union(used_in_column).union(used_in_box)
-                domains[variable] = sorted([v for v in possible_values if v not in used_values])
+    # first pass: used-digit bitmasks (bit v set iff digit v present) per row / column / box
+    row_used = [0] * 9
+    column_used = [0] * 9
+    box_used = [0] * 9
+    for index, value in enumerate(flat):
+        if value != 0:
+            bit = 1 << value
+            row_used[ROW_OF[index]] |= bit
+            column_used[COL_OF[index]] |= bit
+            box_used[BOX_OF[index]] |= bit
+
+    # second pass: one mask lookup per cell instead of rescanning its row, column and box
+    domains: Domains = [0] * 81
+    for index, value in enumerate(flat):
+        if value != 0:
+            domains[index] = 1 << value
+        else:
+            used_values = row_used[ROW_OF[index]] | column_used[COL_OF[index]] | box_used[BOX_OF[index]]
+            domains[index] = 0x3FE & ~used_values
     return domains
 
+def _build_peers() -> Tuple[bytes, ...]:
+    """
+    For each flat cell index, the sorted flat indices of cells sharing its row, column, or 3x3 box,
+    packed as 20 bytes (iterating yields ints).
+    """
+    peers: List[bytes] = []
+    for index in range(81):
+        peers.append(bytes(
+            other for other in range(81)
+            if other != index
+            and (ROW_OF[other] == ROW_OF[index] or COL_OF[other] == COL_OF[index] or BOX_OF[other] == BOX_OF[index])
+        ))
+    return tuple(peers)
+
+# peer table built once at import (flat indices), so forward checking allocates nothing
+PEERS: Tuple[bytes, ...] = _build_peers()
+
 def peers_of(var: Variable) -> List[Variable]:
     """Return list of peer coordinates that share row, column, or 3x3 box with var (excluding var)."""
     row, column = var
-    peers: List[Variable] = []
-
-    # row peers
-    for peer_column in range(9):
-        if peer_column != column:
-            peers.append((row, peer_column))
-
-    # column peers
-    for peer_row in range(9):
-        if peer_row != row:
-            peers.append((peer_row, column))
+    return [divmod(peer_index, 9) for peer_index in PEERS[row * 9 + column]]
 
-    # box peers
-    box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
-    for box_row_index in range(box_start_row, box_start_row + 3):
-        for box_column_index in range(box_start_column, box_start_column + 3):
-            if (box_row_index, box_column_index) != var and (box_row_index, box_column_index) not in peers:
-                peers.append((box_row_index, box_column_index))
-
-    return peers
-
-def forward_check(assign_variable: Variable, assigned_value: int, domains: Dict[Variable, List[int]], grid: Grid) -> Tuple[List[Tuple[Variable, int]], bool]:
+def forward_check(assign_index: int, assigned_value: int, domains: Domains) -> Tuple[List[Tuple[int, int]], bool]:
     """
-    Perform forward checking after assigning assign_variable = assigned_value.
-    Remove assigned_value from domains of unassigned peers.
-    Return (pruned_list, success_flag). pruned_list is the list of removals in order.
+    Perform forward checking after assigning cell assign_index = assigned_value.
+    Clear assigned_value's bit from domains of peers. Assigned peers hold a single
+    different value, so only unassigned peers can actually lose the bit.
+    Return (pruned_list, success_flag). pruned_list holds (peer_index, bit) removals in order.
     success_flag is False if any peer domain becomes empty (domain wiped out).
     """
-    pruned_list: List[Tuple[Variable, int]] = []
-
-    for peer in peers_of(assign_variable):
-        peer_row, peer_column = peer
-        if grid[peer_row][peer_column] != 0:
-            # already assigned in grid
-            continue
-        peer_domain = domains.get(peer, [])
-        if assigned_value in peer_domain:
-            peer_domain.remove(assigned_value)
-            pruned_list.append((peer, assigned_value))
-            if not peer_domain:
+    pruned_list: List[Tuple[int, int]] = []
+    bit = 1 << assigned_value
+
+    for peer_index in PEERS[assign_index]:
+        if domains[peer_index] & bit:
+            domains[peer_index] &= ~bit
+            pruned_list.append((peer_index, bit))
+            if domains[peer_index] == 0:
                 # domain wiped out -> failure, but return the pruned list so caller can undo
                 return pruned_list, False
 
     return pruned_list, True
 
-def undo_pruning(pruned_list: List[Tuple[Variable, int]], domains: Dict[Variable, List[int]]):
+def undo_pruning(pruned_list: List[Tuple[int, int]], domains: Domains):
     """Undo the domain removals recorded in pruned_list."""
-    # restore in reverse order for clarity
-    for variable, removed_value in reversed(pruned_list):
-        if removed_value not in domains[variable]:
-            domains[variable].append(removed_value)
-            domains[variable].sort()
+    for peer_index, removed_bit in pruned_list:
+        domains[peer_index] |= removed_bit
 
 # ----------------------------
-# CSP Backtracking Solver (with forward checking only)
+# Arc consistency (AC-3), run once before search
 # ----------------------------
+def _is_singleton(domain: int) -> bool:
+    """True iff exactly one value bit is set."""
+    return domain != 0 and domain & (domain - 1) == 0
 
-def select_unassigned_variable(grid: Grid) -> Optional[Variable]:
-    """Find next unassigned variable (empty cell) - first empty cell (no MRV)."""
-    for row in range(9):
-        for column in range(9):
-            if grid[row][column] == 0:
-                return (row, column)
-    return None
+def revise(domains: Domains, xi: int, xj: int) -> bool:
+    """
+    Make arc (xi, xj) consistent for the all-different constraint: a value of xi
+    loses its support only when xj is fixed to that same value, so remove xj's
+    value from xi iff xj's domain is a singleton (two bit operations).
+    """
+    domain_j = domains[xj]
+    if domain_j & (domain_j - 1) == 0 and domains[xi] & domain_j:
+        domains[xi] &= ~domain_j
+        return True
+    return False
 
-# instrumentation counters
-assignments_count = 0
-backtracks_count = 0
+def ac3(domains: Domains) -> bool:
+    """
+    Enforce arc consistency over every arc (xi, xj) to a fixpoint, starting from the
+    arcs with a singleton xj (the only arcs that can prune).
+    Only meant as a pre-pass: removals are permanent (not recorded for undo).
+    Return False if some domain is wiped out (the puzzle has no solution).
+    """
+    queue = deque((xi, xj) for xj in range(81) if _is_singleton(domains[xj]) for xi in PEERS[xj])
+    while queue:
+        xi, xj = queue.popleft()
+        if revise(domains, xi, xj):
+            domain_i = domains[xi]
+            if domain_i == 0:
+                return False
+            # arcs (xk, xi) can only prune once xi is a singleton, so only then are they queued
+            if domain_i & (domain_i - 1) == 0:
+                queue.extend((xk, xi) for xk in PEERS[xi] if xk != xj)
+    return True
+
+# ----------------------------
+# CSP Backtracking Solver (forward checking during search)
+# ----------------------------
+
+def select_unassigned_variable(flat: FlatGrid) -> Optional[int]:
+    """Find next unassigned variable (empty cell) - first empty cell (no MRV), as a flat index."""
+    index = flat.find(0)
+    return index if index >= 0 else None
 
-def backtrack_solve(grid: Grid, domains: Dict[Variable, List[int]]) -> Optional[Grid]:
+def backtrack_solve(flat: FlatGrid, domains: Domains, counters: array) -> Optional[FlatGrid]:
     """
     Backtracking solver that uses forward checking.
     domains must be the current domains for each variable (kept up-to-date).
+    Returns the filled flat grid or None; counters[0] / counters[1] grow by
+    the assignments / backtracks made.
     """
-    global assignments_count, backtracks_count
-
-    variable = select_unassigned_variable(grid)
-    if not variable:
-        return grid  # solved
-
-    row, column = variable
-    # iterate domain values from domains dict (deterministic order)
-    for value in list(domains[variable]):
-        if check_constraint(grid, variable, value):
-            # assign
-            grid[row][column] = value
-            assignments_count += 1
-
-            # save domain state for this variable (so undo sets it back to saved)
-            saved_domain_for_variable = list(domains[variable])
-            domains[variable] = [value]
-
-            # forward check: prune peers' domains (now returns pruned list + success flag)
-            pruned, success = forward_check(variable, value, domains, grid)
-            if success:
-                # continue search
-                result = backtrack_solve(grid, domains)
-                if result is not None:
-                    return result
-
-            # undo prunings (if any) and restore domain and assignment
+    assignments = 0
+    backtracks = 0
+
+    index = select_unassigned_variable(flat)
+    if index is None:
+        return flat  # solved
+    # the current frame lives in locals; the saved mask doubles as the remaining values
+    # (walked lowest bit first, ascending values), so domains[index] may change freely
+    saved_domain_for_variable = remaining_values = domains[index]
+    pruned = None   # prunings of the value tried last (None = nothing tried yet)
+    # parent frames (index, remaining values, saved domain, prunings), pushed on descent only
+    stack: List[Tuple[int, int, int, List[Tuple[int, int]]]] = []
+
+    while True:
+        if pruned is not None:
+            # undo prunings (if any) and restore domain and assignment of the previous try
             if pruned:
                 undo_pruning(pruned, domains)
-            grid[row][column] = 0
-            domains[variable] = saved_domain_for_variable
-            backtracks_count += 1
+            flat[index] = 0
+            domains[index] = saved_domain_for_variable
+            backtracks += 1
+
+        if not remaining_values:
+            if not stack:
+                break
+            # values exhausted -> backtrack to the parent frame
+            index, remaining_values, saved_domain_for_variable, pruned = stack.pop()
+            continue
+        bit = remaining_values & -remaining_values
+        remaining_values ^= bit
+        value = bit.bit_length() - 1
+        # no separate constraint scan: forward checking already cleared every value
+        # used by an assigned peer from this domain, so the domain bit is the check
+        # assign
+        flat[index] = value
+        assignments += 1
+        domains[index] = bit
+
+        # forward check: prune peers' domains (returns pruned list + success flag)
+        pruned, success = forward_check(index, value, domains)
+        if not success:
+            continue
 
+        # continue search
+        next_index = select_unassigned_variable(flat)
+        if next_index is None:
+            counters[0] += assignments
+            counters[1] += backtracks
+            return flat  # solved
+        stack.append((index, remaining_values, saved_domain_for_variable, pruned))
+        index = next_index
+        saved_domain_for_variable = remaining_values = domains[index]
+        pruned = None
+
+    counters[0] += assignments
+    counters[1] += backtracks
     return None
 
 # ----------------------------
@@ -236,19 +271,19 @@ if __name__ == "__main__":
     print_grid(puzzle)
 
     # build initial domains with simple pruning using peers' assigned values
-    domains = initial_domains(copy.deepcopy(puzzle))
+    domains = initial_domains(flatten(puzzle))
 
     # reset counters and run
-    assignments_count = 0
-    backtracks_count = 0
+    counters = array("Q", [0, 0])
     start_time = time.perf_counter()
-    solution = backtrack_solve(copy.deepcopy(puzzle), domains)
+    # AC-3 pre-pass, then search
+    solution = backtrack_solve(flatten(puzzle), domains, counters) if ac3(domains) else None
     elapsed_time = time.perf_counter() - start_time
 
     if solution:
         print("=== Solved puzzle ===")
-        print_grid(solution)
+        print_grid(unflatten(solution))
     else:
         print("No solution found.")
 
-    print(f"Assignments: {assignments_count}, Backtracks: {backtracks_count}, Time: {elapsed_time:.4f}s")
+    print(f"Assignments: {counters[0]}, Backtracks: {counters[1]}, Time: {elapsed_time:.4f}s")
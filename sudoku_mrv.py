@@ -1,6 +1,6 @@
 # sudoku_csp.py
 from typing import List, Tuple, Optional
-import copy
+from array import array
 import time
 
 # ----------------------------
@@ -11,55 +11,78 @@ def get_variables() -> List[Tuple[int, int]]:
     """Return list of variables (row, column) for 9x9 Sudoku."""
     return [(row, column) for row in range(9) for column in range(9)]
 
-def get_domain(grid: List[List[int]], var: Tuple[int, int]) -> List[int]:
+# shared, never mutated: callers only iterate the domain
+_FULL_DOMAIN: Tuple[int, ...] = tuple(range(1, 10))
+
+def get_domain(grid: List[List[int]], var: Tuple[int, int]) -> Tuple[int, ...]:
     """Return domain for a given variable (cell). If already filled -> fixed domain. Else -> 1-9."""
     row, column = var
     if grid[row][column] != 0:
-        return [grid[row][column]]
-    return list(range(1, 10))
+        return (grid[row][column],)
+    return _FULL_DOMAIN
+
+# 3x3 box number of each cell, indexed BOX_OF[row][column] (built once at import)
+BOX_OF: Tuple[Tuple[int, ...], ...] = tuple(
+    tuple((row // 3) * 3 + column // 3 for column in range(9)) for row in range(9)
+)
+
+# used-digit bitmasks: bit v set iff digit v is already in that row / column / box
+# (module-level, updated incrementally on assign/undo)
+row_has: List[int] = [0] * 9
+col_has: List[int] = [0] * 9
+box_has: List[int] = [0] * 9
+
+def init_constraint_masks(grid: List[List[int]]):
+    """Reset row_has/col_has/box_has from the digits currently in grid."""
+    for index in range(9):
+        row_has[index] = col_has[index] = box_has[index] = 0
+    for row in range(9):
+        for column in range(9):
+            value = grid[row][column]
+            if value != 0:
+                set_value_bits(row, column, value)
+
+def set_value_bits(row: int, column: int, value: int):
+    """Mark value as used in the row, column and box of (row, column)."""
+    bit = 1 << value
+    row_has[row] |= bit
+    col_has[column] |= bit
+    box_has[BOX_OF[row][column]] |= bit
+
+def clear_value_bits(row: int, column: int, value: int):
+    """Undo set_value_bits (XOR the bit back out)."""
+    bit = 1 << value
+    row_has[row] ^= bit
+    col_has[column] ^= bit
+    box_has[BOX_OF[row][column]] ^= bit
 
 def check_constraint(grid: List[List[int]], var: Tuple[int, int], value: int) -> bool:
-    """Check CSP constraints (row, column, box). Skip the cell itself when scanning."""
+    """
+    Check CSP constraints (row, column, box) with one bitmask test.
+    Requires the row/column/box masks to match grid (see init_constraint_masks).
+    """
     row, column = var
-
-    # Row constraint (skip the cell itself)
-    for column_index in range(9):
-        if column_index == column:
-            continue
-        if grid[row][column_index] == value:
-            return False
-
-    # Column constraint (skip the cell itself)
-    for row_index in range(9):
-        if row_index == row:
-            continue
-        if grid[row_index][column] == value:
-            return False
-
-    # Box constraint (3x3) (skip the cell itself)
-    box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
-    for box_row_index in range(box_start_row, box_start_row + 3):
-        for box_column_index in range(box_start_column, box_start_column + 3):
-            if box_row_index == row and box_column_index == column:
-                continue
-            if grid[box_row_index][box_column_index] == value:
-                return False
-
-    return True
+    bit = 1 << value
+    return not ((row_has[row] | col_has[column] | box_has[BOX_OF[row][column]]) & bit)
 
 # ----------------------------
 # Minimal MRV helper
 # ----------------------------
-def available_values(grid: List[List[int]], var: Tuple[int, int]) -> List[int]:
-    """Return legal values for var under current grid (uses check_constraint)."""
-    row, column = var
-    if grid[row][column] != 0:
-        return [grid[row][column]]
-    values: List[int] = []
-    for candidate_value in range(1, 10):
-        if check_constraint(grid, var, candidate_value):
-            values.append(candidate_value)
-    return values
+
+# bits 1..9 set: every digit still possible
+ALL_VALUES_MASK = 0x3FE
+
+# popcount of a candidate bitmask: int.bit_count (one C call) on Python 3.10+,
+# else a lookup table covering every 10-bit mask
+if hasattr(int, "bit_count"):
+    popcount = int.bit_count
+else:
+    _POPCOUNT_TABLE = bytes(bin(mask).count("1") for mask in range(1024))
+    popcount = _POPCOUNT_TABLE.__getitem__
+
+def available_values_mask(row: int, column: int) -> int:
+    """Bitmask of values still legal at (row, column) under the current row/column/box masks."""
+    return ALL_VALUES_MASK & ~(row_has[row] | col_has[column] | box_has[BOX_OF[row][column]])
 
 # ----------------------------
 # CSP Backtracking Solver (MRV added)
@@ -69,54 +92,79 @@ def select_unassigned_variable(grid: List[List[int]]) -> Optional[Tuple[int, int
     """
     Find next unassigned variable (empty cell) using MRV:
     choose the empty cell with the smallest number of legal values.
+    The count is a popcount of the cell's available-values bitmask.
     """
     best_variable: Optional[Tuple[int, int]] = None
     best_domain_size = 10  # larger than max domain size 9
 
     for row in range(9):
+        grid_row = grid[row]
         for column in range(9):
-            if grid[row][column] == 0:
-                var = (row, column)
-                domain_values = available_values(grid, var)
-                domain_size = len(domain_values)
+            if grid_row[column] == 0:
+                domain_size = popcount(available_values_mask(row, column))
                 # if a cell has zero legal moves, we can return it immediately (causes immediate backtrack)
                 if domain_size == 0:
-                    return var
+                    return (row, column)
                 if domain_size < best_domain_size:
                     best_domain_size = domain_size
-                    best_variable = var
+                    best_variable = (row, column)
                     # perfect MRV short-circuit: can't get smaller than 1
                     if best_domain_size == 1:
                         return best_variable
     return best_variable
 
-# instrumentation counters (module-level)
-assignments_count = 0
-backtracks_count = 0
-
-def backtrack_solve(grid: List[List[int]]) -> Optional[List[List[int]]]:
-    """Backtracking CSP solver for Sudoku (MRV selection)."""
-    global assignments_count, backtracks_count
+def backtrack_solve(grid: List[List[int]], counters: array) -> Optional[List[List[int]]]:
+    """
+    Backtracking CSP solver for Sudoku (MRV selection).
+    Solves grid in place (returned, or None if unsolvable) and adds the
+    assignment / backtrack counts to counters[0] / counters[1].
+    """
+    assignments = 0
+    backtracks = 0
 
+    # the masks are module-level: rebuild them from this grid so a fresh import or a
+    # previous solve can't leave them stale
+    init_constraint_masks(grid)
     variable = select_unassigned_variable(grid)
     if not variable:
         return grid  # solved
+    stack: List[list] = [[variable, available_values_mask(*variable), 0]]
 
-    row, column = variable
-    for value in get_domain(grid, variable):
-        if check_constraint(grid, variable, value):
-            # assign
-            grid[row][column] = value
-            assignments_count += 1
-
-            result = backtrack_solve(grid)
-            if result is not None:
-                return result
+    while stack:
+        frame = stack[-1]
+        variable, remaining_values, value = frame
+        row, column = variable
 
+        if value:
             # undo
             grid[row][column] = 0
-            backtracks_count += 1
+            clear_value_bits(row, column, value)
+            backtracks += 1
 
+        if not remaining_values:
+            stack.pop()  # values exhausted -> backtrack to the parent frame
+            continue
+        # the mask only holds values that passed check_constraint when the cell was selected,
+        # and deeper assignments are all undone by now, so every bit is still legal
+        bit = remaining_values & -remaining_values
+        value = bit.bit_length() - 1
+        frame[1] = remaining_values ^ bit
+        frame[2] = value
+
+        # assign
+        grid[row][column] = value
+        set_value_bits(row, column, value)
+        assignments += 1
+
+        next_variable = select_unassigned_variable(grid)
+        if not next_variable:
+            counters[0] += assignments
+            counters[1] += backtracks
+            return grid  # solved
+        stack.append([next_variable, available_values_mask(*next_variable), 0])
+
+    counters[0] += assignments
+    counters[1] += backtracks
     return None
 
 # ----------------------------
@@ -159,10 +207,10 @@ if __name__ == "__main__":
     print_grid(puzzle)
 
     # reset counters and run
-    assignments_count = 0
-    backtracks_count = 0
+    counters = array("Q", [0, 0])
+    grid = [row[:] for row in puzzle]  # working copy; puzzle stays as given
     start_time = time.perf_counter()
-    solution = backtrack_solve(copy.deepcopy(puzzle))
+    solution = backtrack_solve(grid, counters)
     elapsed_time = time.perf_counter() - start_time
 
     if solution:
@@ -171,4 +219,4 @@ if __name__ == "__main__":
     else:
         print("No solution found.")
 
-    print(f"Assignments: {assignments_count}, Backtracks: {backtracks_count}, Time: {elapsed_time:.4f}s")
+    print(f"Assignments: {counters[0]}, Backtracks: {counters[1]}, Time: {elapsed_time:.4f}s")
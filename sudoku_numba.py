@@ -0,0 +1,368 @@
+# sudoku_numba.py
+from typing import List, Tuple
+import time
+
+import numpy as np
+from numba import njit
+
+# ----------------------------
+# Types
+# ----------------------------
+Grid = List[List[int]]
+
+# bits 1..9 set: every digit still possible
+ALL_VALUES_MASK = 0x3FE
+
+# ----------------------------
+# Bit helpers
+# ----------------------------
+@njit(cache=True)
+def _popcnt(mask: int) -> int:
+    """Count set bits of a 16-bit mask (SWAR bit tricks, no loop)."""
+    mask = mask - ((mask >> 1) & 0x5555)
+    mask = (mask & 0x3333) + ((mask >> 2) & 0x3333)
+    mask = (mask + (mask >> 4)) & 0x0F0F
+    return (mask + (mask >> 8)) & 0x1F
+
+@njit(cache=True)
+def _select_unassigned_variable(grid, domains) -> Tuple[int, int]:
+    """
+    MRV scan over the 81 cells.
+    Returns (cell, domain) where cell = row * 9 + column and domain is its bitmask
+    of values still possible; cell == -1 means the grid is full.
+    """
+    best_cell = -1
+    best_domain = 0
+    best_domain_size = 10  # larger than max domain size 9
+    for cell in range(81):
+        if grid[cell] != 0:
+            continue
+        domain_size = _popcnt(domains[cell])
+        if domain_size < best_domain_size:
+            best_domain_size = domain_size
+            best_cell = cell
+            best_domain = domains[cell]
+            if domain_size == 1:
+                break
+    return best_cell, best_domain
+
+@njit(cache=True)
+def _propagate(domains, peers, units, singles, singles_size, trail_cell, trail_removed, trail_size) -> Tuple[bool, int]:
+    """
+    Propagate to a fixpoint, starting from the singleton cells queued in singles[:singles_size]:
+      - naked singles: a singleton's value is cleared from its peers; a peer left with
+        a single value is queued in turn
+      - hidden singles: per unit, `seen_once` collects values present in some cell and
+        `seen_twice` those present in at least two, so seen_once & ~seen_twice are values
+        with only one place left; that cell is narrowed to the value and queued
+    Fixed cells stay empty (MRV picks them next without branching).
+    singles is scratch space (a cell turns singleton at most once per call, so 81 slots suffice).
+    Removals go onto the trail. Returns (ok, trail_size); ok is False if a domain is
+    wiped out or a unit has no place left for some value.
+    """
+    position = 0
+    while True:
+        # naked singles
+        while position < singles_size:
+            cell = singles[position]
+            bit = domains[cell]
+            position += 1
+            for index in range(20):
+                peer = peers[cell, index]
+                domain = domains[peer]
+                if domain & bit:
+                    domain ^= bit
+                    domains[peer] = domain
+                    trail_cell[trail_size] = peer
+                    trail_removed[trail_size] = bit
+                    trail_size += 1
+                    if domain == 0:
+                        return False, trail_size
+                    # singleton test without a popcount: clearing the lowest bit leaves nothing
+                    if domain & (domain - 1) == 0:
+                        singles[singles_size] = peer
+                        singles_size += 1
+
+        # hidden singles
+        for unit in range(27):
+            seen_once = 0
+            seen_twice = 0
+            for index in range(9):
+                domain = np.int64(domains[units[unit, index]])
+                seen_twice |= seen_once & domain
+                seen_once |= domain
+            if seen_once != ALL_VALUES_MASK:
+                return False, trail_size
+            hidden_singles = seen_once & ~seen_twice
+            while hidden_singles:
+                bit = hidden_singles & -hidden_singles
+                hidden_singles ^= bit
+                found = False
+                for index in range(9):
+                    cell = units[unit, index]
+                    domain = domains[cell]
+                    if domain & bit:
+                        if domain != bit:
+                            trail_cell[trail_size] = cell
+                            trail_removed[trail_size] = domain ^ bit
+                            trail_size += 1
+                            domains[cell] = bit
+                            singles[singles_size] = cell
+                            singles_size += 1
+                        found = True
+                        break
+                if not found:
+                    # its only cell was just fixed to another hidden single
+                    return False, trail_size
+
+        if position == singles_size:
+            return True, trail_size
+
+# ----------------------------
+# Iterative backtracking solver (MRV + forward checking + naked singles on bitmasks)
+# ----------------------------
+@njit(cache=True)
+def solve(grid, domains, peers, units) -> Tuple[bool, int, int]:
+    """
+    Solve `grid` (uint8[81], row-major, 0 = empty) in place.
+    domains is uint16[81] (bit v set iff value v is still possible, see initial_domains)
+    peers is the int32[81, 20] table from _build_peers and units the int32[27, 9] table from _build_units.
+    Uses an explicit stack of (cell, remaining values, trail mark) frames instead of
+    recursion; every domain change goes onto a (cell, removed bits) trail for undo.
+    Naked and hidden singles are propagated to a fixpoint (see _propagate) up front and
+    after every assignment before descending.
+    Returns (solved, assignments_count, backtracks_count).
+    """
+    assignments_count = 0
+    backtracks_count = 0
+
+    stack_cell = np.empty(81, np.int64)
+    stack_remaining = np.empty(81, np.int64)
+    stack_mark = np.empty(81, np.int64)
+    # every live trail entry has cleared at least one of the 81 * 9 domain bits
+    trail_cell = np.empty(81 * 9, np.int64)
+    trail_removed = np.empty(81 * 9, np.int64)
+    trail_size = 0
+    singles = np.empty(81, np.int64)
+
+    # propagate from the givens: queue the empty cells that already have a single value
+    singles_size = 0
+    for cell in range(81):
+        domain = domains[cell]
+        if grid[cell] == 0 and domain & (domain - 1) == 0:
+            singles[singles_size] = cell
+            singles_size += 1
+    ok, trail_size = _propagate(domains, peers, units, singles, singles_size, trail_cell, trail_removed, trail_size)
+    if not ok:
+        return False, assignments_count, backtracks_count
+    # root prunings are never undone
+    trail_size = 0
+
+    cell, domain = _select_unassigned_variable(grid, domains)
+    if cell == -1:
+        return True, assignments_count, backtracks_count
+    depth = 0
+    stack_cell[0] = cell
+    stack_remaining[0] = domain
+
+    while depth >= 0:
+        cell = stack_cell[depth]
+
+        # undo the value tried previously in this frame (if any) and its prunings
+        if grid[cell] != 0:
+            mark = stack_mark[depth]
+            while trail_size > mark:
+                trail_size -= 1
+                domains[trail_cell[trail_size]] |= trail_removed[trail_size]
+            grid[cell] = 0
+            backtracks_count += 1
+
+        remaining = stack_remaining[depth]
+        if remaining == 0:
+            depth -= 1  # exhausted -> backtrack to the parent frame
+            continue
+
+        # take the lowest remaining value
+        bit = remaining & -remaining
+        stack_remaining[depth] = remaining ^ bit
+        stack_mark[depth] = trail_size
+        value = _popcnt(bit - 1)
+
+        # assign
+        grid[cell] = value
+        assignments_count += 1
+        if domains[cell] != bit:
+            trail_cell[trail_size] = cell
+            trail_removed[trail_size] = domains[cell] ^ bit
+            trail_size += 1
+            domains[cell] = bit
+
+        # forward check + singles: start from the assigned cell (domains[cell] == bit now)
+        singles[0] = cell
+        ok, trail_size = _propagate(domains, peers, units, singles, 1, trail_cell, trail_removed, trail_size)
+        if not ok:
+            continue  # a domain or unit was wiped out -> try the next value here
+
+        next_cell, next_domain = _select_unassigned_variable(grid, domains)
+        if next_cell == -1:
+            return True, assignments_count, backtracks_count  # solved
+
+        depth += 1
+        stack_cell[depth] = next_cell
+        stack_remaining[depth] = next_domain
+
+    return False, assignments_count, backtracks_count
+
+@njit(cache=True)
+def initial_domains(grid):
+    """
+    Build uint16 bitmask domains for the 81 cells of a flat grid:
+      - assigned cells -> {value}
+      - unassigned cells -> {1..9} minus values already present in peers
+    """
+    row_used = np.zeros(9, np.int64)
+    col_used = np.zeros(9, np.int64)
+    box_used = np.zeros(9, np.int64)
+    for cell in range(81):
+        value = grid[cell]
+        if value != 0:
+            row = cell // 9
+            column = cell % 9
+            bit = 1 << value
+            row_used[row] |= bit
+            col_used[column] |= bit
+            box_used[(row // 3) * 3 + column // 3] |= bit
+
+    domains = np.empty(81, np.uint16)
+    for cell in range(81):
+        value = grid[cell]
+        if value != 0:
+            domains[cell] = 1 << value
+        else:
+            row = cell // 9
+            column = cell % 9
+            domains[cell] = ALL_VALUES_MASK & ~(row_used[row] | col_used[column] | box_used[(row // 3) * 3 + column // 3])
+    return domains
+
+# ----------------------------
+# Batch solving
+# ----------------------------
+@njit(cache=True)
+def solve_many(grids, peers, units) -> Tuple[np.ndarray, int, int]:
+    """
+    Solve every row of `grids` (uint8[n, 81], e.g. from parse_puzzles) in place,
+    in one compiled call: no per-puzzle Python dispatch or table construction.
+    Returns (solved flags bool[n], total assignments, total backtracks).
+    """
+    solved = np.zeros(grids.shape[0], np.bool_)
+    assignments_count = 0
+    backtracks_count = 0
+    for index in range(grids.shape[0]):
+        grid = grids[index]
+        solved[index], assignments, backtracks = solve(grid, initial_domains(grid), peers, units)
+        assignments_count += assignments
+        backtracks_count += backtracks
+    return solved, assignments_count, backtracks_count
+
+# ----------------------------
+# Setup (plain Python, runs once at import)
+# ----------------------------
+def _build_peers() -> np.ndarray:
+    """For each flat cell, the 20 flat cells sharing its row, column, or 3x3 box, as int32[81, 20]."""
+    peers = np.empty((81, 20), np.int32)
+    for cell in range(81):
+        row, column = divmod(cell, 9)
+        box_start_row, box_start_column = (row // 3) * 3, (column // 3) * 3
+        peer_set = {row * 9 + peer_column for peer_column in range(9)}
+        peer_set.update(peer_row * 9 + column for peer_row in range(9))
+        peer_set.update(
+            box_row * 9 + box_column
+            for box_row in range(box_start_row, box_start_row + 3)
+            for box_column in range(box_start_column, box_start_column + 3)
+        )
+        peer_set.discard(cell)
+        peers[cell] = sorted(peer_set)
+    return peers
+
+def _build_units() -> np.ndarray:
+    """The 27 units (9 rows, 9 columns, 9 boxes) as int32[27, 9] rows of flat cells."""
+    units = np.empty((27, 9), np.int32)
+    for index in range(9):
+        units[index] = [index * 9 + column for column in range(9)]
+        units[9 + index] = [row * 9 + index for row in range(9)]
+        box_start_row, box_start_column = (index // 3) * 3, (index % 3) * 3
+        units[18 + index] = [
+            (box_start_row + row) * 9 + box_start_column + column for row in range(3) for column in range(3)
+        ]
+    return units
+
+# built once at import and passed to the kernel
+PEERS: np.ndarray = _build_peers()
+UNITS: np.ndarray = _build_units()
+
+def parse_puzzles(data: bytes) -> np.ndarray:
+    """
+    Parse whitespace-separated 81-character puzzles (digits, with '0' or '.' for empty
+    cells; the usual one-puzzle-per-line format) into a uint8[n, 81] array for solve_many.
+    """
+    grids = np.frombuffer(b"".join(data.split()), np.uint8).reshape(-1, 81).copy()
+    grids[grids == ord(".")] = ord("0")
+    grids -= ord("0")
+    return grids
+
+# ----------------------------
+# Print Sudoku
+# ----------------------------
+def print_grid(grid: Grid):
+    for row_index in range(9):
+        row_str = ""
+        for column_index in range(9):
+            val = grid[row_index][column_index]
+            row_str += str(val) if val != 0 else "."
+            if column_index in (2, 5):
+                row_str += " | "
+            else:
+                row_str += " "
+        print(row_str)
+        if row_index in (2, 5):
+            print("-" * 21)
+    print()
+
+# ----------------------------
+# Example Puzzle
+# ----------------------------
+if __name__ == "__main__":
+    puzzle: Grid = [
+        [5,3,0, 0,7,0, 0,0,0],
+        [6,0,0, 1,9,5, 0,0,0],
+        [0,9,8, 0,0,0, 0,6,0],
+
+        [8,0,0, 0,6,0, 0,0,3],
+        [4,0,0, 8,0,3, 0,0,1],
+        [7,0,0, 0,2,0, 0,0,6],
+
+        [0,6,0, 0,0,0, 2,8,0],
+        [0,0,0, 4,1,9, 0,0,5],
+        [0,0,0, 0,8,0, 0,7,9]
+    ]
+
+    print("=== Given puzzle ===")
+    print_grid(puzzle)
+
+    # first call compiles the kernel (cached on disk by cache=True); keep it out of the timing
+    warmup_grid = np.asarray(puzzle, np.uint8).ravel()
+    solve(warmup_grid, initial_domains(warmup_grid), PEERS, UNITS)
+
+    grid = np.asarray(puzzle, np.uint8).ravel()
+    domains = initial_domains(grid)
+    start_time = time.perf_counter()
+    solved, assignments_count, backtracks_count = solve(grid, domains, PEERS, UNITS)
+    elapsed_time = time.perf_counter() - start_time
+
+    if solved:
+        print("=== Solved puzzle ===")
+        print_grid(grid.reshape(9, 9).tolist())
+    else:
+        print("No solution found.")
+
+    print(f"Assignments: {assignments_count}, Backtracks: {backtracks_count}, Time: {elapsed_time:.6f}s")